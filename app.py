@@ -1,12 +1,18 @@
-from flask import Flask, jsonify, request, render_template, redirect, url_for
+from flask import (Flask, jsonify, request, render_template, redirect, url_for, Response,
+                   stream_with_context)
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import (LoginManager, UserMixin, login_user, logout_user,
                          current_user)
 import os
+import io
+import csv
 import json
 import secrets
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 # Carrega variáveis de um arquivo .env (útil para rodar localmente).
 # Em produção (Railway) as variáveis vêm do próprio ambiente e isto é ignorado.
@@ -47,8 +53,73 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, DB_FILE)
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# --- SQLite em produção ---
+# Sites menores rodam sem DATABASE_URL, direto no arquivo SQLite, com vários
+# workers do gunicorn gravando ao mesmo tempo. Em modo WAL leitores não bloqueiam
+# a escrita (e vice-versa); o busy timeout faz uma escrita esperar a outra terminar
+# em vez de falhar com "database is locked". Cada worker mantém um pool pequeno de
+# conexões próprias (o engine é criado depois do fork, ao importar o app).
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+SQLITE_CACHE_KB = int(os.environ.get('SQLITE_CACHE_KB', 20000))
+SQLITE_MMAP_MB = int(os.environ.get('SQLITE_MMAP_MB', 128))
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 5))
+
+# --- Pool de conexões (PostgreSQL) ---
+# Dimensionado pelo perfil de serviço (gunicorn.conf.py): cada requisição em
+# andamento no worker (thread, ou greenlet no gevent) pode segurar uma conexão,
+# então o pool acompanha WEB_CONCORRENCIA por padrão — mas sem passar de
+# DB_CONEXOES_POR_WORKER (pool + overflow). No gevent são 100 greenlets por
+# worker; as que não acharem conexão livre esperam na fila do pool (até
+# DB_POOL_TIMEOUT segundos) em vez de estourar o max_connections do banco.
+# pre_ping descarta conexões derrubadas pelo servidor antes de entregá-las.
+WEB_CONCORRENCIA = int(os.environ.get('WEB_CONCORRENCIA', 1))
+DB_CONEXOES_POR_WORKER = 20
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE',
+                                  max(5, min(WEB_CONCORRENCIA, DB_CONEXOES_POR_WORKER))))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW',
+                                     max(0, DB_CONEXOES_POR_WORKER - DB_POOL_SIZE)))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'sim')
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+usa_sqlite = app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+if usa_sqlite and ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+                         'check_same_thread': False},
+        'pool_size': SQLITE_POOL_SIZE,
+        'max_overflow': SQLITE_POOL_SIZE * 2,
+    }
+elif not usa_sqlite:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE,
+    }
+
 db = SQLAlchemy(app)
 
+
+def _configurar_conexao_sqlite(conexao, registro):
+    """PRAGMAs aplicados a cada nova conexão SQLite do pool."""
+    cursor = conexao.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_KB}')
+    cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+
+if usa_sqlite:
+    from sqlalchemy import event
+    with app.app_context():
+        event.listen(db.engine, 'connect', _configurar_conexao_sqlite)
+
 # --- Autenticação (Flask-Login) ---
 # Credenciais vêm das variáveis de ambiente. Troque a senha padrão em produção!
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
@@ -94,9 +165,11 @@ class Colaborador(db.Model):
     valorAdiantamento = db.Column(db.Float)
     tipoAdiantamento = db.Column(db.String(50))
     observacoes = db.Column(db.Text)
+    versao = db.Column(db.Integer, default=1) # incrementada a cada edição (chave do cache de leitura)
     
     # Relacionamentos
     lancamentos_rel = db.relationship('Lancamento', backref='colaborador', lazy=True, cascade="all, delete-orphan")
+    arquivados_rel = db.relationship('LancamentoArquivado', lazy=True, cascade="all, delete-orphan")
     emprestimos_rel = db.relationship('Emprestimo', backref='colaborador', lazy=True, cascade="all, delete-orphan")
 
     def to_dict(self):
@@ -137,6 +210,7 @@ class Emprestimo(db.Model):
     parcelas = db.Column(db.Integer)
     inicio = db.Column(db.String(10)) # Data YYYY-MM-DD
     descricao = db.Column(db.String(255))
+    pagoArquivado = db.Column(db.Float, default=0) # soma paga em competências já arquivadas
     
     def to_dict(self):
         """Converte objeto Empréstimo para dicionário"""
@@ -146,11 +220,12 @@ class Emprestimo(db.Model):
             "parcelas": self.parcelas,
             "inicio": self.inicio,
             "descricao": self.descricao,
+            "pagoArquivado": self.pagoArquivado or 0,
             "colaboradorId": self.colaborador_id
         }
 
-class Lancamento(db.Model):
-    # Tabela para lançamentos mensais
+class CamposLancamento:
+    # Colunas comuns ao lançamento mensal ativo e ao arquivado (mesma estrutura)
     id = db.Column(db.String(50), primary_key=True)
     colaboradorId = db.Column(db.String(50), db.ForeignKey('colaborador.id'), nullable=False)
     mes = db.Column(db.String(7), nullable=False) # YYYY-MM
@@ -176,6 +251,7 @@ class Lancamento(db.Model):
     faltas = db.Column(db.Text) # JSON: [{"data":"YYYY-MM-DD", "obs":...}]
     atestados = db.Column(db.Text) # JSON: [{"data":"YYYY-MM-DD", "dias":N, "obs":...}]
     status = db.Column(db.String(20), default='aberto') # 'aberto' ou 'finalizado'
+    versao = db.Column(db.Integer, default=1) # incrementada a cada edição (chave do cache de leitura)
 
     def to_dict(self):
         """Converte objeto Lancamento para dicionário"""
@@ -207,6 +283,56 @@ class Lancamento(db.Model):
             "status": self.status
         }
 
+class Lancamento(CamposLancamento, db.Model):
+    # Tabela para lançamentos mensais (competências em uso)
+    pass
+
+class LancamentoArquivado(CamposLancamento, db.Model):
+    # Arquivo frio: lançamentos de competências finalizadas antigas, fora da
+    # tabela principal para manter /api/dados pequeno. Ver arquivar_competencias().
+    arquivadoEm = db.Column(db.String(19)) # Data/hora YYYY-MM-DD HH:MM:SS
+
+    def to_dict(self):
+        dados = super().to_dict()
+        dados["arquivado"] = True
+        return dados
+
+class VersaoDados(db.Model):
+    # Linha única com o carimbo de versão global dos dados. Toda escrita incrementa
+    # o valor na mesma transação; cada worker compara com o que já conhece para
+    # saber se o seu cache de leitura ficou velho.
+    id = db.Column(db.Integer, primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+class Tarefa(db.Model):
+    # Tarefa pesada (backup, exportação) executada em segundo plano. Fica no banco
+    # para que qualquer worker do gunicorn responda o progresso e entregue o resultado.
+    id = db.Column(db.String(50), primary_key=True)
+    tipo = db.Column(db.String(30), nullable=False) # chave de TIPOS_TAREFA
+    parametros = db.Column(db.Text) # JSON
+    status = db.Column(db.String(20), default='pendente') # 'pendente', 'executando', 'concluida' ou 'erro'
+    progresso = db.Column(db.Integer, default=0) # 0 a 100
+    mensagem = db.Column(db.String(255))
+    resultado = db.Column(db.LargeBinary)
+    resultadoTipo = db.Column(db.String(100)) # mimetype do resultado
+    nomeArquivo = db.Column(db.String(255))
+    criadoEm = db.Column(db.String(19)) # Data/hora YYYY-MM-DD HH:MM:SS
+    atualizadoEm = db.Column(db.String(19))
+
+    def to_dict(self):
+        """Converte objeto Tarefa para dicionário (sem o conteúdo do resultado)"""
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "parametros": json.loads(self.parametros) if self.parametros else {},
+            "status": self.status,
+            "progresso": self.progresso,
+            "mensagem": self.mensagem,
+            "nomeArquivo": self.nomeArquivo,
+            "criadoEm": self.criadoEm,
+            "atualizadoEm": self.atualizadoEm
+        }
+
 # ==================== FUNÇÃO DE SETUP DO BD ====================
 
 # Cria as tabelas se elas não existirem no arquivo SQLite
@@ -235,12 +361,20 @@ with app.app_context():
         db.session.execute(text('ALTER TABLE lancamento ADD COLUMN faltas TEXT'))
     if 'atestados' not in colunas_lancamento:
         db.session.execute(text('ALTER TABLE lancamento ADD COLUMN atestados TEXT'))
+    if 'versao' not in colunas_lancamento:
+        db.session.execute(text('ALTER TABLE lancamento ADD COLUMN versao INTEGER DEFAULT 1'))
 
     colunas_colaborador = {col['name'] for col in inspector.get_columns('colaborador')}
     if 'empresa' not in colunas_colaborador:
         db.session.execute(text('ALTER TABLE colaborador ADD COLUMN empresa VARCHAR(50)'))
     if 'valorDiaria' not in colunas_colaborador:
         db.session.execute(text('ALTER TABLE colaborador ADD COLUMN "valorDiaria" FLOAT'))
+    if 'versao' not in colunas_colaborador:
+        db.session.execute(text('ALTER TABLE colaborador ADD COLUMN versao INTEGER DEFAULT 1'))
+
+    colunas_emprestimo = {col['name'] for col in inspector.get_columns('emprestimo')}
+    if 'pagoArquivado' not in colunas_emprestimo:
+        db.session.execute(text('ALTER TABLE emprestimo ADD COLUMN "pagoArquivado" FLOAT DEFAULT 0'))
 
     # Corrige colunas antigas criadas pequenas demais (ex.: seguroVida guardava
     # "Ativo"/"Inativo" em VARCHAR(3)). SQLite não enforce isso e não suporta
@@ -255,8 +389,29 @@ with app.app_context():
 
     db.session.commit()
 
+    # Carimbo global de versão usado pelo cache de leitura (linha única, id = 1).
+    # Vários workers podem subir juntos num banco novo: quem perder a corrida do
+    # INSERT só descarta o próprio e segue com a linha criada pelo outro.
+    from sqlalchemy.exc import IntegrityError
+    if not db.session.get(VersaoDados, 1):
+        try:
+            db.session.add(VersaoDados(id=1, valor=0))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
 # ==================== FUNÇÕES UTILITÁRIAS ====================
 
+def gerar_id():
+    """ID novo: timestamp em ms + 6 dígitos aleatórios.
+
+    Só o timestamp colide quando dois operadores salvam no mesmo milissegundo
+    (UNIQUE constraint failed); o sufixo aleatório torna isso desprezível e o ID
+    continua numérico e crescendo com o tempo.
+    """
+    return f'{int(datetime.now().timestamp() * 1000)}{secrets.randbelow(10 ** 6):06d}'
+
+
 def update_or_create_emprestimos(colaborador_id, emprestimos_data):
     """Atualiza ou cria empréstimos para um colaborador."""
     existing_ids = {e.id for e in Colaborador.query.get(colaborador_id).emprestimos_rel}
@@ -281,8 +436,7 @@ def update_or_create_emprestimos(colaborador_id, emprestimos_data):
                 emprestimo.descricao = emp_data.get('descricao', emprestimo.descricao)
         else:
             # Criar novo
-            # Usando datetime e os.urandom para garantir IDs únicos e não sequenciais
-            new_id = str(int(datetime.now().timestamp() * 1000) + int(os.urandom(2).hex(), 16))
+            new_id = gerar_id()
             novo_emprestimo = Emprestimo(
                 id=new_id,
                 colaborador_id=colaborador_id,
@@ -293,12 +447,495 @@ def update_or_create_emprestimos(colaborador_id, emprestimos_data):
             )
             db.session.add(novo_emprestimo)
 
+# ==================== CACHE DE LEITURA ====================
+# Leituras (/api/dados, /api/colaboradores, /api/lancamentos) são muito mais
+# frequentes que escritas. Cada worker do gunicorn mantém um LRU local com:
+#   - dicionários serializados por linha, chaveados por (id, versao) da linha;
+#   - listas completas já serializadas, chaveadas pelo carimbo global VersaoDados.
+# Toda rota de escrita chama registrar_alteracao(), que incrementa o carimbo no
+# banco dentro da mesma transação; os demais workers percebem a mudança na
+# próxima leitura e descartam as listas. Nenhum serviço de cache externo é usado.
+
+CACHE_MAX_ITENS = int(os.environ.get('CACHE_MAX_ITENS', 5000))
+
+
+class CacheLRU:
+    """LRU limitado, seguro entre threads, com contadores de acerto/falha."""
+
+    def __init__(self, max_itens):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+            return None
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'itens': len(self._itens),
+                'maxItens': self.max_itens,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+            }
+
+
+cache_linhas = CacheLRU(CACHE_MAX_ITENS)
+cache_listas = CacheLRU(16)
+cache_relatorios = CacheLRU(32)
+_versao_conhecida = {'valor': None}
+
+
+def registrar_alteracao():
+    """Incrementa o carimbo global de versão (chamar antes do commit de qualquer escrita)."""
+    VersaoDados.query.filter_by(id=1).update(
+        {VersaoDados.valor: VersaoDados.valor + 1}, synchronize_session=False)
+
+
+def nova_versao(obj):
+    """Incrementa a versão de uma linha editada, invalidando seu dicionário em cache.
+
+    O incremento é feito no próprio UPDATE (versao = versao + 1), não em Python:
+    dois saves simultâneos da mesma linha sempre resultam em versões distintas.
+    """
+    from sqlalchemy import func
+    modelo = type(obj)
+    obj.versao = func.coalesce(modelo.versao, 1) + 1
+
+
+def versao_atual():
+    """Lê o carimbo global e descarta as listas locais se outro worker escreveu."""
+    valor = db.session.query(VersaoDados.valor).filter_by(id=1).scalar() or 0
+    if _versao_conhecida['valor'] != valor:
+        cache_listas.limpar()
+        _versao_conhecida['valor'] = valor
+    return valor
+
+
+def serializar_linha(obj):
+    """to_dict() de uma linha, reaproveitando o resultado enquanto a versão não mudar."""
+    chave = (obj.__tablename__, obj.id, obj.versao)
+    dados = cache_linhas.obter(chave)
+    if dados is None:
+        dados = obj.to_dict()
+        cache_linhas.guardar(chave, dados)
+    return dados
+
+
+def listar_serializado(modelo):
+    """Lista completa serializada de um modelo, em cache enquanto o carimbo global não mudar."""
+    chave = (modelo.__tablename__, versao_atual())
+    dados = cache_listas.obter(chave)
+    if dados is None:
+        dados = [serializar_linha(obj) for obj in modelo.query.all()]
+        cache_listas.guardar(chave, dados)
+    return dados
+
+# ==================== ARQUIVO DE COMPETÊNCIAS ====================
+# Competências (meses) totalmente finalizadas e mais antigas que o horizonte são
+# movidas de `lancamento` para `lancamento_arquivado`, com faltas, atestados e
+# pagamentos de empréstimo (que vivem nos campos JSON do próprio lançamento).
+# O quanto já foi pago de cada empréstimo nesses meses fica somado em
+# Emprestimo.pagoArquivado, para o saldo continuar correto no frontend.
+
+ARQUIVO_HORIZONTE_MESES = int(os.environ.get('ARQUIVO_HORIZONTE_MESES', 24))
+COLUNAS_LANCAMENTO = Lancamento.__table__.columns.keys()
+
+
+def mes_limite_arquivo(horizonte_meses):
+    """Competência (YYYY-MM) a partir da qual os meses continuam na tabela principal."""
+    hoje = datetime.now()
+    total = hoje.year * 12 + (hoje.month - 1) - horizonte_meses
+    return f'{total // 12:04d}-{total % 12 + 1:02d}'
+
+
+def _somar_pagos_arquivados(lancamento, sinal):
+    """Soma (sinal=1) ou devolve (sinal=-1) os pagamentos do lançamento em Emprestimo.pagoArquivado."""
+    for pago in json.loads(lancamento.emprestimosPagos) if lancamento.emprestimosPagos else []:
+        emprestimo = db.session.get(Emprestimo, str(pago.get('id')))
+        if emprestimo:
+            valor = float(pago.get('valor') or 0)
+            emprestimo.pagoArquivado = (emprestimo.pagoArquivado or 0) + sinal * valor
+
+
+def _mover_lancamentos(origem, destino, filtro, **extras):
+    """Copia as linhas de `origem` que casam com `filtro` para `destino` e as remove da origem."""
+    colaboradores_afetados = set()
+    movidos = 0
+    for linha in origem.query.filter(filtro).all():
+        if db.session.get(destino, linha.id):
+            continue  # já existe do outro lado (ex.: restauração repetida)
+        campos = {col: getattr(linha, col) for col in COLUNAS_LANCAMENTO}
+        campos.update(extras)
+        novo = destino(**campos)
+        _somar_pagos_arquivados(linha, 1 if destino is LancamentoArquivado else -1)
+        db.session.add(novo)
+        db.session.delete(linha)
+        colaboradores_afetados.add(linha.colaboradorId)
+        movidos += 1
+
+    # pagoArquivado faz parte do to_dict do colaborador: invalida o cache dele
+    for colaborador_id in colaboradores_afetados:
+        colaborador = db.session.get(Colaborador, colaborador_id)
+        if colaborador:
+            nova_versao(colaborador)
+    return movidos
+
+
+def arquivar_competencias(horizonte_meses=None):
+    """Arquiva as competências finalizadas anteriores ao horizonte. Retorna {mes: qtd}."""
+    if horizonte_meses is None:
+        horizonte_meses = ARQUIVO_HORIZONTE_MESES
+    from sqlalchemy import case, func, or_
+    pendente = or_(Lancamento.status.is_(None), Lancamento.status != 'finalizado')
+    meses = [mes for (mes,) in db.session.query(Lancamento.mes)
+             .filter(Lancamento.mes < mes_limite_arquivo(horizonte_meses))
+             .group_by(Lancamento.mes)
+             .having(func.sum(case((pendente, 1), else_=0)) == 0)
+             .order_by(Lancamento.mes)]
+
+    arquivadoEm = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    resultado = {}
+    for mes in meses:
+        resultado[mes] = _mover_lancamentos(Lancamento, LancamentoArquivado,
+                                            Lancamento.mes == mes, arquivadoEm=arquivadoEm)
+    if resultado:
+        registrar_alteracao()
+    db.session.commit()
+    return resultado
+
+
+def restaurar_competencia(mes):
+    """Devolve uma competência arquivada para a tabela principal. Retorna a quantidade movida."""
+    movidos = _mover_lancamentos(LancamentoArquivado, Lancamento, LancamentoArquivado.mes == mes)
+    if movidos:
+        registrar_alteracao()
+    db.session.commit()
+    return movidos
+
+# ==================== TAREFAS EM SEGUNDO PLANO ====================
+# Operações pesadas rodam num pool de threads do próprio processo, fora da thread
+# da requisição, liberando o worker para o uso interativo. Estado, progresso e
+# resultado ficam na tabela `tarefa`, então o acompanhamento pode cair em qualquer
+# worker. Cada tipo de tarefa é uma função (parametros, progresso) que devolve
+# (conteudo_bytes, mimetype, nome_do_arquivo) ou levanta ValueError com a mensagem.
+
+TAREFAS_MAX_THREADS = int(os.environ.get('TAREFAS_MAX_THREADS', 2))
+TAREFA_TIMEOUT_MINUTOS = int(os.environ.get('TAREFA_TIMEOUT_MINUTOS', 30))
+TAREFA_RETENCAO_DIAS = 7
+
+executor_tarefas = ThreadPoolExecutor(max_workers=TAREFAS_MAX_THREADS,
+                                      thread_name_prefix='tarefa')
+
+
+def _agora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def dados_backup(progresso=None):
+    """Dump completo (colaboradores + lançamentos ativos e arquivados).
+
+    `progresso` (usado pela tarefa) é chamado entre as etapas. Cada etapa já sai
+    serializada, então o commit dele não expira objetos ainda por ler.
+    """
+    colaboradores = [c.to_dict() for c in Colaborador.query.all()]
+    if progresso:
+        progresso(20)
+    lancamentos = [l.to_dict() for l in Lancamento.query.all()]
+    if progresso:
+        progresso(50)
+    lancamentos += [l.to_dict() for l in LancamentoArquivado.query.all()]
+    return {
+        'colaboradores': colaboradores,
+        'lancamentos': lancamentos
+    }
+
+
+def tarefa_backup(parametros, progresso):
+    dados = dados_backup(progresso)
+    progresso(80)
+    conteudo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+    nome = f"backup_{datetime.now().strftime('%Y-%m-%d_%H%M')}.json"
+    return conteudo, 'application/json', nome
+
+
+MESES_ABREV = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+
+
+def _moeda_csv(valor):
+    return f'{valor or 0:.2f}'.replace('.', ',')
+
+
+def tarefa_csv_mes(parametros, progresso):
+    """CSV de adiantamentos/pagamentos de uma competência (mesmo layout do antigo exportarCSV)."""
+    mes = parametros.get('mes') or ''
+    if len(mes) != 7 or mes[4] != '-':
+        raise ValueError('Selecione um mês para exportar.')
+
+    # Colunas simples (tuplas), não entidades: o commit de progresso() expiraria
+    # objetos ORM já carregados e cada um voltaria a ser consultado no banco.
+    linhas = []
+    for modelo in (Lancamento, LancamentoArquivado):
+        linhas += (db.session.query(Colaborador.nome, modelo.adiantamentoContab,
+                                    modelo.adiantamentoEspecie, modelo.pagamentoContab,
+                                    modelo.pagamentoEspecie)
+                   .select_from(modelo)
+                   .outerjoin(Colaborador, Colaborador.id == modelo.colaboradorId)
+                   .filter(modelo.mes == mes)
+                   .all())
+    if not linhas:
+        raise ValueError('Não há lançamentos para o mês selecionado.')
+
+    saida = ['Nome;Adiantamento Contabilidade;Adiantamento Espécie;Pagamento Contabilidade;Pagamento Espécie']
+    for i, (nome, *valores) in enumerate(linhas, start=1):
+        saida.append(';'.join([nome or 'Desconhecido'] + [_moeda_csv(v) for v in valores]))
+        if i % 200 == 0:
+            progresso(int(90 * i / len(linhas)))
+
+    conteudo = ('\ufeff' + '\n'.join(saida) + '\n').encode('utf-8')
+    ano, mm = mes.split('-')
+    nome = f'lancamentos_{MESES_ABREV[int(mm) - 1]}-{ano}.csv'
+    return conteudo, 'text/csv; charset=utf-8', nome
+
+
+TIPOS_TAREFA = {
+    'backup': tarefa_backup,
+    'csv_mes': tarefa_csv_mes,
+}
+
+
+def _executar_tarefa(tarefa_id):
+    """Corpo executado no pool de threads, com contexto de aplicação próprio.
+
+    Qualquer falha, inclusive ao marcar a tarefa como 'executando' ou ao gravar o
+    resultado, termina em status 'erro' (sem isso ela ficaria parada até o timeout).
+    """
+    with app.app_context():
+        try:
+            tarefa = db.session.get(Tarefa, tarefa_id)
+            tarefa.status = 'executando'
+            tarefa.atualizadoEm = _agora()
+            db.session.commit()
+
+            def progresso(percentual):
+                tarefa.progresso = max(0, min(100, int(percentual)))
+                tarefa.atualizadoEm = _agora()
+                db.session.commit()
+
+            parametros = json.loads(tarefa.parametros) if tarefa.parametros else {}
+            conteudo, mimetype, nome = TIPOS_TAREFA[tarefa.tipo](parametros, progresso)
+            tarefa.resultado = conteudo
+            tarefa.resultadoTipo = mimetype
+            tarefa.nomeArquivo = nome
+            tarefa.status = 'concluida'
+            tarefa.progresso = 100
+            tarefa.atualizadoEm = _agora()
+            db.session.commit()
+            return
+        except ValueError as e:
+            mensagem = str(e)
+        except Exception as e:
+            print(f"ERRO NA TAREFA {tarefa_id}: {e}")
+            mensagem = 'Erro interno ao executar a tarefa'
+
+        # Descarta o que ficou pela metade e grava o erro na tarefa recarregada
+        try:
+            db.session.rollback()
+            tarefa = db.session.get(Tarefa, tarefa_id)
+            if tarefa:
+                tarefa.status = 'erro'
+                tarefa.mensagem = mensagem
+                tarefa.atualizadoEm = _agora()
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"ERRO AO REGISTRAR FALHA DA TAREFA {tarefa_id}: {e}")
+
+
+def submeter_tarefa(tipo, parametros=None):
+    """Registra a tarefa no banco e a agenda no pool. Retorna o objeto Tarefa."""
+    if tipo not in TIPOS_TAREFA:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo}')
+
+    # Limpeza preguiçosa: resultados antigos não precisam ficar no banco para sempre
+    limite = (datetime.now() - timedelta(days=TAREFA_RETENCAO_DIAS)).strftime('%Y-%m-%d %H:%M:%S')
+    Tarefa.query.filter(Tarefa.criadoEm < limite).delete(synchronize_session=False)
+
+    tarefa = Tarefa(id=secrets.token_hex(8), tipo=tipo,
+                    parametros=json.dumps(parametros or {}),
+                    status='pendente', progresso=0,
+                    criadoEm=_agora(), atualizadoEm=_agora())
+    db.session.add(tarefa)
+    db.session.commit()
+    executor_tarefas.submit(_executar_tarefa, tarefa.id)
+    return tarefa
+
+
+def verificar_tarefa_interrompida(tarefa):
+    """Marca como erro uma tarefa sem atualização há mais que o timeout (worker reiniciado)."""
+    if tarefa.status not in ('pendente', 'executando'):
+        return
+    limite = (datetime.now() - timedelta(minutes=TAREFA_TIMEOUT_MINUTOS)).strftime('%Y-%m-%d %H:%M:%S')
+    if (tarefa.atualizadoEm or '') < limite:
+        tarefa.status = 'erro'
+        tarefa.mensagem = 'Tarefa interrompida (o servidor foi reiniciado durante a execução)'
+        db.session.commit()
+
+# ==================== RELATÓRIO ANUAL ====================
+# Extrato anual por colaborador calculado numa única consulta: os lançamentos do
+# ano (ativos + arquivados) são agregados por mês e as colunas acumuladas saem de
+# funções de janela (SUM ... OVER), que PostgreSQL e SQLite (3.28+) suportam.
+# Só a leitura dos campos JSON (faltas/atestados) muda entre os dois bancos.
+
+COLUNAS_VALOR_ANUAL = ['remuneracao', 'bonificacao', 'horasExtras', 'descontos', 'liquido']
+COLUNAS_DIAS_ANUAL = ['diasFerias', 'faltas', 'atestados', 'diasAtestado']
+
+# Os campos JSON só contam quando guardam de fato uma lista (o save pode gravar
+# 'null'). Atestado sem "dias" válido conta 1 dia, como no dashboard; o número é
+# lido pelo prefixo inteiro do valor, tolerante como o CAST do SQLite.
+_LISTA_PG = "CASE WHEN json_typeof(NULLIF(l.{campo}, '')::json) = 'array' THEN l.{campo}::json END"
+_LISTA_SQLITE = "CASE WHEN json_type(NULLIF(l.{campo}, '')) = 'array' THEN l.{campo} END"
+
+_JSON_ANUAL = {
+    'postgresql': {
+        'faltas': f"COALESCE(json_array_length({_LISTA_PG.format(campo='faltas')}), 0)",
+        'atestados': f"COALESCE(json_array_length({_LISTA_PG.format(campo='atestados')}), 0)",
+        'diasAtestado': "CAST(COALESCE((SELECT SUM(COALESCE(NULLIF("
+                        "substring(a->>'dias' from '^ *([0-9]+)')::integer, 0), 1)) "
+                        f"FROM json_array_elements({_LISTA_PG.format(campo='atestados')}) a), 0) AS INTEGER)",
+    },
+    'sqlite': {
+        'faltas': f"COALESCE(json_array_length({_LISTA_SQLITE.format(campo='faltas')}), 0)",
+        'atestados': f"COALESCE(json_array_length({_LISTA_SQLITE.format(campo='atestados')}), 0)",
+        'diasAtestado': "CAST(COALESCE((SELECT SUM(COALESCE(NULLIF("
+                        "CAST(json_extract(a.value, '$.dias') AS INTEGER), 0), 1)) "
+                        f"FROM json_each({_LISTA_SQLITE.format(campo='atestados')}) a), 0) AS INTEGER)",
+    },
+}
+
+
+def _sql_relatorio_anual(dialeto):
+    json_expr = _JSON_ANUAL.get(dialeto, _JSON_ANUAL['sqlite'])
+    colunas_lanc = ('"colaboradorId", mes, ferias, "diasFerias", remuneracao, bonificacao, '
+                    '"horasExtras", emprestimo, "adiantamentoEspecie", "adiantamentoContab", '
+                    '"liquidoTotal", faltas, atestados')
+    acumulados = ',\n            '.join(
+        f'SUM("{col}") OVER janela AS "{col}Acumulado"'
+        for col in COLUNAS_VALOR_ANUAL + COLUNAS_DIAS_ANUAL)
+    return f"""
+        WITH lanc AS (
+            SELECT {colunas_lanc} FROM lancamento WHERE mes BETWEEN :inicio AND :fim
+            UNION ALL
+            SELECT {colunas_lanc} FROM lancamento_arquivado WHERE mes BETWEEN :inicio AND :fim
+        ), mensal AS (
+            SELECT l."colaboradorId" AS "colaboradorId", c.nome AS nome, l.mes AS mes,
+                   COALESCE(l.remuneracao, 0.0) AS remuneracao,
+                   COALESCE(l.bonificacao, 0.0) AS bonificacao,
+                   COALESCE(l."horasExtras", 0.0) AS "horasExtras",
+                   COALESCE(l.emprestimo, 0.0) + COALESCE(l."adiantamentoEspecie", 0.0)
+                       + COALESCE(l."adiantamentoContab", 0.0) AS descontos,
+                   COALESCE(l."liquidoTotal", 0.0) AS liquido,
+                   CASE WHEN l.ferias = 'Férias' THEN COALESCE(NULLIF(l."diasFerias", 0), 30)
+                        ELSE 0 END AS "diasFerias",
+                   {json_expr['faltas']} AS faltas,
+                   {json_expr['atestados']} AS atestados,
+                   {json_expr['diasAtestado']} AS "diasAtestado"
+            FROM lanc l
+            JOIN colaborador c ON c.id = l."colaboradorId"
+        )
+        SELECT mensal.*,
+            {acumulados}
+        FROM mensal
+        WINDOW janela AS (PARTITION BY "colaboradorId" ORDER BY mes
+                          ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+        ORDER BY nome, "colaboradorId", mes
+    """
+
+
+def linhas_relatorio_anual(ano):
+    """Gera uma linha (dict) por colaborador/mês do ano, já com os acumulados."""
+    from sqlalchemy import text
+    sql = text(_sql_relatorio_anual(db.engine.dialect.name))
+    resultado = db.session.execute(
+        sql, {'inicio': f'{ano:04d}-01', 'fim': f'{ano:04d}-12'},
+        execution_options={'stream_results': True})
+    for linha in resultado.mappings():
+        yield dict(linha)
+
+
+def relatorio_anual(ano):
+    """Relatório anual agrupado por colaborador: meses + totais do ano."""
+    colaboradores = []
+    for linha in linhas_relatorio_anual(ano):
+        if not colaboradores or colaboradores[-1]['colaboradorId'] != linha['colaboradorId']:
+            colaboradores.append({'colaboradorId': linha['colaboradorId'],
+                                  'nome': linha['nome'], 'meses': [], 'totais': {}})
+        atual = colaboradores[-1]
+        atual['meses'].append({k: v for k, v in linha.items() if k not in ('colaboradorId', 'nome')})
+        # A última linha da janela acumulada já é o total do ano
+        atual['totais'] = {col: linha[f'{col}Acumulado']
+                           for col in COLUNAS_VALOR_ANUAL + COLUNAS_DIAS_ANUAL}
+    return {'ano': ano, 'colaboradores': colaboradores}
+
+
+def assinatura_ano(ano):
+    """Impressão digital barata dos dados de um ano (ativos + arquivados + colaboradores).
+
+    Muda sempre que um lançamento do ano é criado, editado (versao), excluído ou
+    arquivado, ou quando um colaborador muda — mas não com saves de outros anos.
+    """
+    from sqlalchemy import func
+    inicio, fim = f'{ano:04d}-01', f'{ano:04d}-12'
+    partes = []
+    for modelo in (Lancamento, LancamentoArquivado):
+        partes += db.session.query(func.count(modelo.id), func.sum(modelo.versao),
+                                   func.max(modelo.id)).filter(modelo.mes.between(inicio, fim)).one()
+    partes += db.session.query(func.count(Colaborador.id), func.sum(Colaborador.versao)).one()
+    return tuple(partes)
+
+
+def ano_fechado(ano):
+    """Ano já terminou e não tem lançamento em aberto (o arquivo só guarda finalizados)."""
+    if ano >= datetime.now().year:
+        return False
+    from sqlalchemy import or_
+    aberto = Lancamento.query.filter(
+        Lancamento.mes.between(f'{ano:04d}-01', f'{ano:04d}-12'),
+        or_(Lancamento.status.is_(None), Lancamento.status != 'finalizado')).first()
+    return aberto is None
+
 # ==================== AUTENTICAÇÃO ====================
 
 @app.before_request
 def exigir_login():
-    """Exige login para tudo, exceto a tela de login e os arquivos estáticos."""
-    if request.endpoint in ('login', 'static'):
+    """Exige login para tudo, exceto a tela de login, os arquivos estáticos e o health check."""
+    if request.endpoint in ('login', 'static', 'healthz'):
         return
     if not current_user.is_authenticated:
         if request.path.startswith('/api/'):
@@ -306,6 +943,18 @@ def exigir_login():
         return redirect(url_for('login', next=request.path))
 
 
+@app.route('/healthz')
+def healthz():
+    """Health check barato para o balanceador: sem sessão e sem ORM, só um SELECT 1."""
+    from sqlalchemy import text
+    try:
+        with db.engine.connect() as conexao:
+            conexao.execute(text('SELECT 1'))
+    except Exception as e:
+        return jsonify({'status': 'erro', 'banco': str(e.__class__.__name__)}), 503
+    return jsonify({'status': 'ok'})
+
+
 def _url_interna_segura(destino):
     """Evita open redirect: só aceita caminhos internos (iniciados por '/')."""
     if destino and destino.startswith('/') and not destino.startswith('//'):
@@ -372,20 +1021,24 @@ def redir_lancamentos():
 
 @app.route('/api/dados', methods=['GET'])
 def obter_dados():
-    """Retorna todos os dados de uma vez (Colaboradores e Lançamentos)"""
-    colaboradores_list = Colaborador.query.all()
-    lancamentos_list = Lancamento.query.all()
-    
+    """Retorna todos os dados de uma vez (Colaboradores e Lançamentos).
+
+    Por padrão só os lançamentos ativos; com ?incluirArquivo=1 inclui também as
+    competências arquivadas (marcadas com "arquivado": true).
+    """
+    lancamentos = listar_serializado(Lancamento)
+    if request.args.get('incluirArquivo') == '1':
+        lancamentos = lancamentos + listar_serializado(LancamentoArquivado)
+
     return jsonify({
-        'colaboradores': [c.to_dict() for c in colaboradores_list],
-        'lancamentos': [l.to_dict() for l in lancamentos_list]
+        'colaboradores': listar_serializado(Colaborador),
+        'lancamentos': lancamentos
     })
 
 @app.route('/api/colaboradores', methods=['GET'])
 def obter_colaboradores():
     """Retorna todos os colaboradores"""
-    colaboradores_list = Colaborador.query.all()
-    return jsonify([c.to_dict() for c in colaboradores_list])
+    return jsonify(listar_serializado(Colaborador))
 
 @app.route('/api/colaboradores', methods=['POST'])
 def adicionar_colaborador():
@@ -415,10 +1068,11 @@ def adicionar_colaborador():
             
             # Atualiza empréstimos relacionados
             update_or_create_emprestimos(colaborador.id, data.get('emprestimos', []))
+            nova_versao(colaborador)
             
         # 3. Lógica de Criação
         else:
-            new_id = str(int(datetime.now().timestamp() * 1000))
+            new_id = gerar_id()
             colaborador = Colaborador(
                 id=new_id,
                 nome=data.get('nome', 'Novo Colaborador'),
@@ -448,6 +1102,7 @@ def adicionar_colaborador():
             # Cria empréstimos (se houver)
             update_or_create_emprestimos(colaborador.id, data.get('emprestimos', []))
             
+        registrar_alteracao()
         db.session.commit()
         return jsonify(colaborador.to_dict()), 201
         
@@ -465,6 +1120,7 @@ def excluir_colaborador(id):
     
     try:
         db.session.delete(colaborador)
+        registrar_alteracao()
         db.session.commit()
         return jsonify({'mensagem': 'Colaborador excluído com sucesso'}), 200
     except Exception as e:
@@ -475,8 +1131,7 @@ def excluir_colaborador(id):
 @app.route('/api/lancamentos', methods=['GET'])
 def obter_lancamentos():
     """Retorna todos os lançamentos"""
-    lancamentos_list = Lancamento.query.all()
-    return jsonify([l.to_dict() for l in lancamentos_list])
+    return jsonify(listar_serializado(Lancamento))
 
 @app.route('/api/lancamentos', methods=['POST'])
 def adicionar_lancamento():
@@ -484,6 +1139,17 @@ def adicionar_lancamento():
     data = request.json
     
     try:
+        # Competência arquivada é somente leitura: precisa ser reaberta antes
+        # (senão a restauração deixaria dois lançamentos no mesmo mês)
+        if data.get('id'):
+            arquivado = LancamentoArquivado.query.get(data['id'])
+        else:
+            arquivado = LancamentoArquivado.query.filter_by(
+                colaboradorId=data.get('colaboradorId'), mes=data.get('mes')).first()
+        if arquivado:
+            return jsonify({'erro': 'Este mês está arquivado para o colaborador. '
+                                    'Reabra o lançamento antes de editar.'}), 409
+
         # Lógica de Edição
         if data.get('id'):
             lancamento = Lancamento.query.get(data['id'])
@@ -497,10 +1163,11 @@ def adicionar_lancamento():
                     setattr(lancamento, key, json.dumps(value or []))
                 elif hasattr(lancamento, key):
                     setattr(lancamento, key, value)
+            nova_versao(lancamento)
             
         # Lógica de Criação
         else:
-            new_id = str(int(datetime.now().timestamp() * 1000))
+            new_id = gerar_id()
             lancamento = Lancamento(
                 id=new_id,
                 colaboradorId=data['colaboradorId'],
@@ -530,6 +1197,7 @@ def adicionar_lancamento():
             )
             db.session.add(lancamento)
             
+        registrar_alteracao()
         db.session.commit()
         return jsonify(lancamento.to_dict()), 201
         
@@ -547,6 +1215,7 @@ def excluir_lancamento(id):
     
     try:
         db.session.delete(lancamento)
+        registrar_alteracao()
         db.session.commit()
         return jsonify({'mensagem': 'Lançamento excluído com sucesso'}), 200
     except Exception as e:
@@ -561,32 +1230,188 @@ def finalizar_lancamento(id):
         return jsonify({'erro': 'Lançamento não encontrado'}), 404
         
     lancamento.status = 'finalizado'
+    nova_versao(lancamento)
+    registrar_alteracao()
     db.session.commit()
     return jsonify({'mensagem': 'Lançamento finalizado'}), 200
 
 @app.route('/api/lancamentos/<id>/reabrir', methods=['PUT'])
 def reabrir_lancamento(id):
-    """Reabre um lançamento"""
+    """Reabre um lançamento (restaurando antes a competência, se estiver arquivada)"""
     lancamento = Lancamento.query.get(id)
     if not lancamento:
-        return jsonify({'erro': 'Lançamento não encontrado'}), 404
+        arquivado = LancamentoArquivado.query.get(id)
+        if not arquivado:
+            return jsonify({'erro': 'Lançamento não encontrado'}), 404
+        restaurar_competencia(arquivado.mes)
+        lancamento = Lancamento.query.get(id)
         
     lancamento.status = 'aberto'
+    nova_versao(lancamento)
+    registrar_alteracao()
     db.session.commit()
     return jsonify({'mensagem': 'Lançamento reaberto'}), 200
 
+# ==================== RELATÓRIOS ====================
+
+@app.route('/api/relatorios/anual', methods=['GET'])
+def obter_relatorio_anual():
+    """Extrato anual por colaborador (mês a mês + acumulados).
+
+    ?formato=csv devolve o mesmo conteúdo em CSV, gerado em streaming linha a linha.
+    Anos fechados ficam em cache até a próxima alteração nos dados daquele ano.
+    """
+    try:
+        ano = int(request.args.get('ano', ''))
+    except ValueError:
+        return jsonify({'erro': 'Informe o ano (ex.: ?ano=2024)'}), 400
+    if not 1900 <= ano <= 9999:
+        return jsonify({'erro': 'Ano inválido'}), 400
+
+    if request.args.get('formato') == 'csv':
+        colunas = (['colaboradorId', 'nome', 'mes'] + COLUNAS_VALOR_ANUAL + COLUNAS_DIAS_ANUAL
+                   + [f'{col}Acumulado' for col in COLUNAS_VALOR_ANUAL + COLUNAS_DIAS_ANUAL])
+
+        def gerar():
+            # csv.writer escapa nomes com ';', aspas ou quebra de linha
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer, delimiter=';', lineterminator='\n')
+            escritor.writerow(colunas)
+            yield '\ufeff' + buffer.getvalue()
+            for linha in linhas_relatorio_anual(ano):
+                buffer.seek(0)
+                buffer.truncate()
+                escritor.writerow([_moeda_csv(linha[c]) if isinstance(linha[c], float)
+                                   else linha[c] for c in colunas])
+                yield buffer.getvalue()
+
+        return Response(stream_with_context(gerar()), content_type='text/csv; charset=utf-8',
+                        headers={'Content-Disposition': f'attachment; filename="relatorio_anual_{ano}.csv"'})
+
+    if not ano_fechado(ano):
+        return jsonify(relatorio_anual(ano))
+
+    chave = (ano, assinatura_ano(ano))
+    dados = cache_relatorios.obter(chave)
+    if dados is None:
+        dados = relatorio_anual(ano)
+        cache_relatorios.guardar(chave, dados)
+    return jsonify(dados)
+
+# ==================== ARQUIVO (competências antigas) ====================
+
+@app.route('/api/competencias/arquivadas', methods=['GET'])
+def listar_competencias_arquivadas():
+    """Lista as competências arquivadas com a quantidade de lançamentos de cada uma."""
+    from sqlalchemy import func
+    linhas = (db.session.query(LancamentoArquivado.mes,
+                               func.count(LancamentoArquivado.id),
+                               func.max(LancamentoArquivado.arquivadoEm))
+              .group_by(LancamentoArquivado.mes)
+              .order_by(LancamentoArquivado.mes)
+              .all())
+    return jsonify([{'mes': mes, 'quantidade': qtd, 'arquivadoEm': quando}
+                    for mes, qtd, quando in linhas])
+
+@app.route('/api/competencias/<mes>/lancamentos', methods=['GET'])
+def obter_competencia_arquivada(mes):
+    """Lançamentos de uma competência arquivada (a tela busca só o mês que vai mostrar)."""
+    return jsonify([serializar_linha(l) for l in
+                    LancamentoArquivado.query.filter_by(mes=mes).all()])
+
+@app.route('/api/competencias/arquivar', methods=['POST'])
+def arquivar_antigas():
+    """Arquiva as competências finalizadas mais antigas que o horizonte (em meses)."""
+    data = request.get_json(silent=True) or {}
+    try:
+        horizonte = int(data.get('horizonteMeses', ARQUIVO_HORIZONTE_MESES))
+    except (TypeError, ValueError):
+        return jsonify({'erro': 'horizonteMeses inválido'}), 400
+    if horizonte < 1:
+        return jsonify({'erro': 'horizonteMeses deve ser pelo menos 1'}), 400
+
+    try:
+        arquivados = arquivar_competencias(horizonte)
+        return jsonify({'arquivados': arquivados}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERRO AO ARQUIVAR COMPETÊNCIAS: {e}")
+        return jsonify({'erro': 'Erro interno ao arquivar competências'}), 500
+
+@app.route('/api/competencias/<mes>/restaurar', methods=['POST'])
+def restaurar_arquivada(mes):
+    """Devolve uma competência arquivada para os lançamentos ativos."""
+    try:
+        movidos = restaurar_competencia(mes)
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERRO AO RESTAURAR COMPETÊNCIA: {e}")
+        return jsonify({'erro': 'Erro interno ao restaurar competência'}), 500
+    if not movidos:
+        return jsonify({'erro': 'Competência não está arquivada'}), 404
+    return jsonify({'mensagem': 'Competência restaurada', 'restaurados': movidos}), 200
+
+@app.cli.command('arquivar')
+def comando_arquivar():
+    """flask --app app arquivar — arquiva competências antigas (útil em agendador/cron)."""
+    arquivados = arquivar_competencias()
+    for mes, qtd in arquivados.items():
+        print(f'{mes}: {qtd} lançamento(s) arquivado(s)')
+    if not arquivados:
+        print('Nenhuma competência para arquivar.')
+
+@app.route('/api/cache/estatisticas', methods=['GET'])
+def estatisticas_cache():
+    """Contadores do cache de leitura deste worker (para monitoramento)."""
+    return jsonify({
+        'pid': os.getpid(),
+        'versaoDados': _versao_conhecida['valor'],
+        'linhas': cache_linhas.estatisticas(),
+        'listas': cache_listas.estatisticas(),
+        'relatorios': cache_relatorios.estatisticas(),
+    })
+
 # ==================== BACKUP (somente leitura) ====================
 
 @app.route('/api/backup', methods=['GET'])
 def fazer_backup():
-    """Retorna todos os dados em JSON para fins de backup."""
-    colaboradores_list = Colaborador.query.all()
-    lancamentos_list = Lancamento.query.all()
-    
-    return jsonify({
-        'colaboradores': [c.to_dict() for c in colaboradores_list],
-        'lancamentos': [l.to_dict() for l in lancamentos_list]
-    })
+    """Retorna todos os dados em JSON para fins de backup (incluindo competências arquivadas).
+
+    Para bases grandes, prefira POST /api/tarefas com {"tipo": "backup"}.
+    """
+    return jsonify(dados_backup())
+
+# ==================== TAREFAS (segundo plano) ====================
+
+@app.route('/api/tarefas', methods=['POST'])
+def criar_tarefa():
+    """Agenda uma tarefa pesada. Corpo: {"tipo": "backup"|"csv_mes", "parametros": {...}}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        tarefa = submeter_tarefa(data.get('tipo'), data.get('parametros') or {})
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    return jsonify(tarefa.to_dict()), 202
+
+@app.route('/api/tarefas/<id>', methods=['GET'])
+def consultar_tarefa(id):
+    """Status e progresso de uma tarefa"""
+    tarefa = Tarefa.query.get(id)
+    if not tarefa:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    verificar_tarefa_interrompida(tarefa)
+    return jsonify(tarefa.to_dict())
+
+@app.route('/api/tarefas/<id>/resultado', methods=['GET'])
+def baixar_resultado_tarefa(id):
+    """Download do resultado de uma tarefa concluída"""
+    tarefa = Tarefa.query.get(id)
+    if not tarefa:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    if tarefa.status != 'concluida':
+        return jsonify({'erro': 'Tarefa ainda não concluída', 'status': tarefa.status}), 409
+    return Response(tarefa.resultado, content_type=tarefa.resultadoTipo,
+                    headers={'Content-Disposition': f'attachment; filename="{tarefa.nomeArquivo}"'})
 
 if __name__ == '__main__':
     # Criar pasta static se não existir (para o servidor de dev)
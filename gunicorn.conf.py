@@ -0,0 +1,73 @@
+"""
+Configuração do gunicorn (carregada automaticamente pelo `gunicorn app:app`).
+
+O perfil de serviço vem do ambiente, para o mesmo Procfile servir em qualquer site:
+
+    PERFIL_SERVIDOR=sync      workers síncronos, 1 requisição por vez em cada um
+    PERFIL_SERVIDOR=threads   (padrão) workers gthread — várias threads por worker,
+                              um /api/backup lento não trava o worker inteiro
+    PERFIL_SERVIDOR=gevent    workers gevent (requer `pip install gevent`; com
+                              PostgreSQL, também `psycogreen`)
+
+Ajustes finos (sobrepõem o perfil): WEB_CONCURRENCY (workers), WEB_THREADS,
+WEB_WORKER_CONNECTIONS (greenlets por worker no gevent), WEB_TIMEOUT (segundos) e
+PORT. O pool do banco é dimensionado em app.py (DB_POOL_SIZE, DB_MAX_OVERFLOW,
+DB_POOL_TIMEOUT, DB_POOL_PRE_PING), por padrão a partir de WEB_CONCORRENCIA —
+quantas requisições um worker atende ao mesmo tempo (threads, ou
+worker_connections no gevent) — limitado a 20 conexões por worker.
+"""
+
+import multiprocessing
+import os
+
+PERFIS = {
+    'sync': {'worker_class': 'sync', 'threads': 1},
+    'threads': {'worker_class': 'gthread', 'threads': 4},
+    'gevent': {'worker_class': 'gevent', 'threads': 1, 'worker_connections': 100},
+}
+
+perfil = os.environ.get('PERFIL_SERVIDOR', 'threads')
+if perfil not in PERFIS:
+    raise SystemExit(f'PERFIL_SERVIDOR inválido: {perfil!r} (use {", ".join(PERFIS)})')
+
+if perfil == 'gevent':
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        print('[gunicorn.conf] gevent não instalado — usando o perfil "threads".')
+        perfil = 'threads'
+
+_ajustes = PERFIS[perfil]
+
+# Railway define PORT; localmente escuta só na máquina, como o padrão do gunicorn
+bind = f"0.0.0.0:{os.environ['PORT']}" if os.environ.get('PORT') else '127.0.0.1:8000'
+worker_class = _ajustes['worker_class']
+
+# Sem SECRET_KEY cada worker sorteia a sua e o login de um não vale nos outros,
+# então nesse caso fica um worker só (o comportamento antigo).
+if os.environ.get('WEB_CONCURRENCY'):
+    workers = int(os.environ['WEB_CONCURRENCY'])
+elif os.environ.get('SECRET_KEY'):
+    workers = min(4, multiprocessing.cpu_count() * 2)
+else:
+    print('[gunicorn.conf] SECRET_KEY não definida — usando 1 worker.')
+    workers = 1
+threads = int(os.environ.get('WEB_THREADS', _ajustes['threads']))
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS',
+                                        _ajustes.get('worker_connections', 1000)))
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+
+# Repassa ao app quantas requisições cada worker atende ao mesmo tempo, usado para
+# dimensionar o pool do banco: no gevent são as greenlets, nos demais as threads.
+concorrencia = worker_connections if worker_class == 'gevent' else threads
+os.environ.setdefault('WEB_CONCORRENCIA', str(concorrencia))
+
+
+def post_fork(server, worker):
+    # Com gevent, o psycopg2 só coopera com as greenlets se for "patcheado"
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            pass
@@ -16,7 +16,7 @@ import sys
 import json
 from datetime import date
 
-from app import app, db, Colaborador, Emprestimo, Lancamento
+from app import app, db, Colaborador, Emprestimo, Lancamento, registrar_alteracao
 
 MARCADOR = '[DEMONSTRACAO] Registro fictício para apresentação.'
 
@@ -62,6 +62,7 @@ def limpar():
             return
         for c in alvos:
             db.session.delete(c)  # cascade remove lançamentos e empréstimos
+        registrar_alteracao()  # invalida o cache de leitura dos workers em execução
         db.session.commit()
         print(f'{len(alvos)} colaborador(es) de demonstração removido(s), '
               f'junto com seus lançamentos e empréstimos.')
@@ -168,6 +169,7 @@ def semear():
                     status='finalizado',
                 ))
 
+        registrar_alteracao()  # invalida o cache de leitura dos workers em execução
         db.session.commit()
         print(f'Dados de demonstração criados: {len(PESSOAS)} colaboradores '
               f'e lançamentos de {meses[0]} a {meses[-1]}.')
@@ -16,6 +16,10 @@ window.fetch = function (...args) {
 let colaboradores = [];
 let lancamentos = [];
 let colabIdToDelete = null;
+// Competências arquivadas ('YYYY-MM') e os lançamentos dos meses já buscados.
+// O arquivo não vem em /api/dados: cada mês é carregado só quando a tela precisa.
+let competenciasArquivadas = new Set();
+let lancamentosArquivados = {};
 
 // ==================== HELPERS DE MÁSCARA / MOEDA ====================
 
@@ -480,7 +484,10 @@ document.addEventListener('DOMContentLoaded', function () {
 
 async function carregarDados() {
     try {
-        const response = await fetch(`${API_URL}/dados`);
+        const [response, respArquivo] = await Promise.all([
+            fetch(`${API_URL}/dados`),
+            fetch(`${API_URL}/competencias/arquivadas`)
+        ]);
         if (!response.ok) {
             throw new Error(`Erro do servidor: ${response.status}`);
         }
@@ -488,6 +495,11 @@ async function carregarDados() {
         colaboradores = Array.isArray(dados.colaboradores) ? dados.colaboradores : [];
         lancamentos = Array.isArray(dados.lancamentos) ? dados.lancamentos : [];
 
+        // Só a lista de meses; os lançamentos de cada um vêm sob demanda
+        const arquivadas = respArquivo.ok ? await respArquivo.json() : [];
+        competenciasArquivadas = new Set(arquivadas.map(c => c.mes));
+        lancamentosArquivados = {};
+
         // Ordena por nome (A-Z) uma única vez aqui, para que toda tela que lista
         // colaboradores (selects, tabelas, filtros) já receba em ordem alfabética.
         colaboradores.sort((a, b) => (a.nome || '').localeCompare(b.nome || '', 'pt-BR', { sensitivity: 'base' }));
@@ -499,6 +511,28 @@ async function carregarDados() {
     }
 }
 
+// Busca (uma vez) os lançamentos de uma competência arquivada. Meses que não
+// estão no arquivo são ignorados.
+async function carregarCompetenciaArquivada(mes) {
+    if (!competenciasArquivadas.has(mes) || lancamentosArquivados[mes]) return;
+    try {
+        const response = await fetch(`${API_URL}/competencias/${mes}/lancamentos`);
+        if (!response.ok) {
+            throw new Error(`Erro do servidor: ${response.status}`);
+        }
+        lancamentosArquivados[mes] = await response.json();
+    } catch (error) {
+        console.error('Erro ao carregar competência arquivada:', error);
+        notificar('Erro ao carregar a competência arquivada.', 'error');
+    }
+}
+
+// Procura um lançamento entre os ativos e os meses arquivados já carregados
+function buscarLancamento(id) {
+    return lancamentos.find(l => l.id === id)
+        || Object.values(lancamentosArquivados).flat().find(l => l.id === id);
+}
+
 function configurarEventos() {
     // Forms
     const formColab = document.getElementById('formColaborador');
@@ -551,6 +585,16 @@ function configurarEventos() {
         const filtroNomeLanc = document.getElementById('filtroNomeLanc');
         if (filtroNomeLanc) filtroNomeLanc.addEventListener('input', renderizarLancamentos);
 
+        // Mês arquivado selecionado: carrega os lançamentos dele na lista (para
+        // visualizar, gerar recibo ou reabrir)
+        const filtroMesCSV = document.getElementById('filtroMesCSV');
+        if (filtroMesCSV) {
+            filtroMesCSV.addEventListener('change', async function () {
+                await carregarCompetenciaArquivada(this.value);
+                renderizarLancamentos();
+            });
+        }
+
         // Pagamentos por empréstimo (linhas dinâmicas): soma no total ao editar
         const listaEmp = document.getElementById('emprestimosDetalheLista');
         if (listaEmp) {
@@ -602,7 +646,16 @@ function renderizar() {
         const urlParams = new URLSearchParams(window.location.search);
         const editarId = urlParams.get('editar');
         const visualizarId = urlParams.get('visualizar');
-        if (editarId) {
+        const mesParam = urlParams.get('mes');
+        if (visualizarId && competenciasArquivadas.has(mesParam)) {
+            // Vindo do dashboard com um lançamento arquivado: mostra o mês dele
+            window.history.replaceState({}, document.title, window.location.pathname);
+            filtroMesCSV.value = mesParam;
+            carregarCompetenciaArquivada(mesParam).then(() => {
+                renderizarLancamentos();
+                visualizarLancamento(visualizarId);
+            });
+        } else if (editarId) {
             window.history.replaceState({}, document.title, window.location.pathname);
             setTimeout(() => editarLancamento(editarId), 300);
         } else if (visualizarId) {
@@ -624,7 +677,10 @@ function badgeContratacao(tipo) {
     return `<span class="inline-flex items-center rounded-full px-2.5 py-0.5 text-xs font-medium ring-1 ring-inset ${cls}">${tipo || '-'}</span>`;
 }
 
-function badgeStatus(status) {
+function badgeStatus(status, arquivado) {
+    if (arquivado) {
+        return '<span class="inline-flex items-center gap-1 rounded-full bg-slate-100 px-2.5 py-0.5 text-xs font-medium text-slate-600 ring-1 ring-inset ring-slate-500/20"><i class="fas fa-box-archive"></i> Arquivado</span>';
+    }
     return status === 'finalizado'
         ? '<span class="inline-flex items-center gap-1 rounded-full bg-emerald-50 px-2.5 py-0.5 text-xs font-medium text-emerald-700 ring-1 ring-inset ring-emerald-600/20"><i class="fas fa-check-circle"></i> Finalizado</span>'
         : '<span class="inline-flex items-center gap-1 rounded-full bg-amber-50 px-2.5 py-0.5 text-xs font-medium text-amber-700 ring-1 ring-inset ring-amber-600/20"><i class="fas fa-clock"></i> Em Aberto</span>';
@@ -1026,14 +1082,26 @@ function preencherCamposAutomaticamente() {
 
 // Soma quanto já foi pago de um empréstimo em todos os lançamentos.
 // `exceptMes` (YYYY-MM) permite ignorar o mês que está sendo editado.
+// Meses arquivados não vêm em `lancamentos`: entram via `pagoArquivado`.
 function calcularPagoEmprestimo(empId, exceptMes) {
     let pago = 0;
+    (colaboradores || []).forEach(c => {
+        (c.emprestimos || []).forEach(e => {
+            if (String(e.id) === String(empId)) pago += (parseFloat(e.pagoArquivado) || 0);
+        });
+    });
     (lancamentos || []).forEach(l => {
         if (exceptMes && l.mes === exceptMes) return;
         (l.emprestimosPagos || []).forEach(p => {
             if (String(p.id) === String(empId)) pago += (parseFloat(p.valor) || 0);
         });
     });
+    // Visualizando um mês arquivado: o pago dele já está em `pagoArquivado`
+    (lancamentosArquivados[exceptMes] || []).forEach(l => {
+        (l.emprestimosPagos || []).forEach(p => {
+            if (String(p.id) === String(empId)) pago -= (parseFloat(p.valor) || 0);
+        });
+    });
     return pago;
 }
 
@@ -1197,7 +1265,8 @@ async function salvarLancamento(e) {
             limparFormLancamento();
             await carregarDados();
         } else {
-            notificar('Erro ao salvar lançamento', 'error');
+            const erro = await response.json().catch(() => ({}));
+            notificar(erro.erro || 'Erro ao salvar lançamento', 'error');
         }
     } catch (error) {
         console.error('Erro:', error);
@@ -1325,7 +1394,11 @@ function renderizarLancamentos() {
     const tbody = document.getElementById('tabelaLancamentos');
     if (!tbody) return;
 
-    if (lancamentos.length === 0) {
+    // Ativos + o mês arquivado selecionado no filtro de mês, se houver
+    const mesFiltro = document.getElementById('filtroMesCSV')?.value;
+    const todos = lancamentos.concat(lancamentosArquivados[mesFiltro] || []);
+
+    if (todos.length === 0) {
         tbody.innerHTML = `<tr><td colspan="5" class="py-10 text-center text-slate-400"><i class="fas fa-file-invoice mb-2 block text-2xl"></i>Nenhum lançamento registrado</td></tr>`;
         return;
     }
@@ -1333,11 +1406,11 @@ function renderizarLancamentos() {
     // Busca por nome do colaborador
     const termo = (document.getElementById('filtroNomeLanc')?.value || '').trim().toLowerCase();
     const lista = termo
-        ? lancamentos.filter(l => {
+        ? todos.filter(l => {
             const c = colaboradores.find(co => co.id === l.colaboradorId);
             return c && c.nome.toLowerCase().includes(termo);
         })
-        : lancamentos;
+        : todos;
 
     if (lista.length === 0) {
         tbody.innerHTML = `<tr><td colspan="5" class="py-10 text-center text-slate-400"><i class="fas fa-magnifying-glass mb-2 block text-2xl"></i>Nenhum lançamento encontrado para "${termo}"</td></tr>`;
@@ -1368,14 +1441,14 @@ function renderizarLancamentos() {
             <td class="px-4 py-3 font-medium text-slate-800">${c ? c.nome : 'Desconhecido'}</td>
             <td class="px-4 py-3 text-slate-600">${formatarMesAno(l.mes)}</td>
             <td class="px-4 py-3 font-medium text-slate-800">${formatarMoeda(l.liquidoTotal || 0)}</td>
-            <td class="px-4 py-3">${badgeStatus(l.status)}</td>
+            <td class="px-4 py-3">${badgeStatus(l.status, l.arquivado)}</td>
             <td class="px-4 py-3"><div class="flex items-center justify-center gap-1">${acoes}</div></td>
         </tr>`;
     }).join('');
 }
 
 function editarLancamento(id) {
-    const l = lancamentos.find(lanc => lanc.id === id);
+    const l = buscarLancamento(id);
     if (!l) return;
 
     document.getElementById('lancEditId').value = l.id;
@@ -1478,7 +1551,7 @@ function editarLancamento(id) {
 }
 
 function visualizarLancamento(id) {
-    const l = lancamentos.find(lanc => lanc.id === id);
+    const l = buscarLancamento(id);
     if (!l) return;
 
     editarLancamento(id);
@@ -1508,8 +1581,8 @@ function editarLancamentoDash(id) {
     window.location.href = `/lancamentos?editar=${id}`;
 }
 
-function visualizarLancamentoDash(id) {
-    window.location.href = `/lancamentos?visualizar=${id}`;
+function visualizarLancamentoDash(id, mes) {
+    window.location.href = `/lancamentos?visualizar=${id}` + (mes ? `&mes=${mes}` : '');
 }
 
 function editarColaboradorDash(id) {
@@ -1604,7 +1677,7 @@ function atualizarSelectColaboradores() {
 }
 
 function gerarRecibo(id) {
-    const l = lancamentos.find(lanc => lanc.id === id);
+    const l = buscarLancamento(id);
     if (!l) return;
     const c = colaboradores.find(co => co.id === l.colaboradorId);
     if (!c) return;
@@ -1672,7 +1745,7 @@ function formatarDataExtenso(data) {
 }
 
 function gerarReciboPremio(id) {
-    const l = lancamentos.find(lanc => lanc.id === id);
+    const l = buscarLancamento(id);
     if (!l) return;
     const c = colaboradores.find(co => co.id === l.colaboradorId);
     if (!c) return;
@@ -1701,7 +1774,7 @@ function gerarReciboPremio(id) {
 }
 
 function gerarReciboAutonomo(id) {
-    const l = lancamentos.find(lanc => lanc.id === id);
+    const l = buscarLancamento(id);
     if (!l) return;
     const c = colaboradores.find(co => co.id === l.colaboradorId);
     if (!c) return;
@@ -1758,7 +1831,11 @@ function fatiaDashboard() {
         (!empresa || c.empresa === empresa));
 
     const ids = new Set(colabs.map(c => c.id));
-    const lancsTodosMeses = lancamentos.filter(l => ids.has(l.colaboradorId));
+    // Mês arquivado: entra o que carregarCompetenciaArquivada já trouxe
+    const base = comp !== 'todos' && lancamentosArquivados[comp]
+        ? lancamentos.concat(lancamentosArquivados[comp])
+        : lancamentos;
+    const lancsTodosMeses = base.filter(l => ids.has(l.colaboradorId));
     const lancs = comp === 'todos' ? lancsTodosMeses : lancsTodosMeses.filter(l => l.mes === comp);
 
     return { colabs, lancs, lancsTodosMeses, comp };
@@ -1790,6 +1867,14 @@ function aplicarFiltrosDashboard() {
         document.getElementById('filtroMes').value = new Date().toISOString().substring(0, 7);
     }
 
+    // Mês arquivado ainda não carregado: busca e redesenha quando chegar
+    const comp = getCompetencia();
+    if (competenciasArquivadas.has(comp) && !lancamentosArquivados[comp]) {
+        carregarCompetenciaArquivada(comp).then(() => {
+            if (lancamentosArquivados[comp]) aplicarFiltrosDashboard();
+        });
+    }
+
     const fatia = fatiaDashboard();
     atualizarCardsDashboard(fatia);
     renderizarGraficos(fatia);
@@ -2137,7 +2222,7 @@ function renderizarLancamentosDash(lista) {
     tbody.innerHTML = lista.map(l => {
         const c = colaboradores.find(co => co.id === l.colaboradorId);
         const btnAcao = l.status === 'finalizado'
-            ? botaoAcao(`visualizarLancamentoDash('${l.id}')`, 'view', 'fa-eye', 'Visualizar (somente leitura)')
+            ? botaoAcao(`visualizarLancamentoDash('${l.id}'${l.arquivado ? `, '${l.mes}'` : ''})`, 'view', 'fa-eye', 'Visualizar (somente leitura)')
             : botaoAcao(`editarLancamentoDash('${l.id}')`, 'edit', 'fa-pen', 'Editar lançamento');
 
         return `
@@ -2147,7 +2232,7 @@ function renderizarLancamentosDash(lista) {
                 <td class="px-4 py-3 text-slate-600">${formatarMoeda(l.totalRecebido || 0)}</td>
                 <td class="px-4 py-3 text-slate-600">${formatarMoeda((l.adiantamentoEspecie || 0) + (l.adiantamentoContab || 0))}</td>
                 <td class="px-4 py-3 font-medium text-slate-800">${formatarMoeda(l.liquidoTotal || 0)}</td>
-                <td class="px-4 py-3">${badgeStatus(l.status)}</td>
+                <td class="px-4 py-3">${badgeStatus(l.status, l.arquivado)}</td>
                 <td class="px-4 py-3"><div class="flex justify-center">${btnAcao}</div></td>
             </tr>`;
     }).join('');
@@ -2163,43 +2248,61 @@ function limparFiltros() {
 
 // ==================== EXPORTAÇÃO CSV ====================
 
-function exportarCSV() {
+// O CSV é gerado no servidor como tarefa em segundo plano (POST /api/tarefas),
+// o que inclui também competências arquivadas. Aqui só acompanhamos o progresso
+// e baixamos o arquivo quando ficar pronto.
+async function exportarCSV() {
     const mesFiltro = document.getElementById('filtroMesCSV').value;
     if (!mesFiltro) {
         notificar('Selecione um mês para exportar.', 'info');
         return;
     }
 
-    const lancamentosMes = lancamentos.filter(l => l.mes === mesFiltro);
-    if (lancamentosMes.length === 0) {
-        notificar('Não há lançamentos para o mês selecionado.', 'info');
-        return;
+    try {
+        const tarefa = await executarTarefa('csv_mes', { mes: mesFiltro });
+        if (tarefa.status !== 'concluida') {
+            notificar(tarefa.mensagem || 'Erro ao exportar CSV', tarefa.mensagem ? 'info' : 'error');
+            return;
+        }
+        await baixarResultadoTarefa(tarefa);
+        notificar(`CSV exportado! ${formatarMesAno(mesFiltro)}.`, 'success');
+    } catch (error) {
+        console.error('Erro ao exportar CSV:', error);
+        notificar('Erro ao exportar CSV', 'error');
     }
+}
 
-    let csv = 'Nome;Adiantamento Contabilidade;Adiantamento Espécie;Pagamento Contabilidade;Pagamento Espécie\n';
-    lancamentosMes.forEach(l => {
-        const colaborador = colaboradores.find(c => c.id === l.colaboradorId);
-        const nome = colaborador ? colaborador.nome : 'Desconhecido';
-        const adiantamentoContab = (l.adiantamentoContab || 0).toFixed(2).replace('.', ',');
-        const adiantamentoEspecie = (l.adiantamentoEspecie || 0).toFixed(2).replace('.', ',');
-        const pagamentoContab = (l.pagamentoContab || 0).toFixed(2).replace('.', ',');
-        const pagamentoEspecie = (l.pagamentoEspecie || 0).toFixed(2).replace('.', ',');
-        csv += `${nome};${adiantamentoContab};${adiantamentoEspecie};${pagamentoContab};${pagamentoEspecie}\n`;
+// Agenda uma tarefa no servidor e consulta o status até terminar (concluida/erro).
+async function executarTarefa(tipo, parametros, intervaloMs = 1000) {
+    const response = await fetch(`${API_URL}/tarefas`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ tipo, parametros })
     });
+    if (!response.ok) throw new Error(`Erro do servidor: ${response.status}`);
+    let tarefa = await response.json();
+    while (tarefa.status === 'pendente' || tarefa.status === 'executando') {
+        await new Promise(resolve => setTimeout(resolve, intervaloMs));
+        const status = await fetch(`${API_URL}/tarefas/${tarefa.id}`);
+        if (!status.ok) throw new Error(`Erro do servidor: ${status.status}`);
+        tarefa = await status.json();
+    }
+    return tarefa;
+}
 
-    const BOM = '﻿';
-    const blob = new Blob([BOM + csv], { type: 'text/csv;charset=utf-8;' });
+async function baixarResultadoTarefa(tarefa) {
+    const response = await fetch(`${API_URL}/tarefas/${tarefa.id}/resultado`);
+    if (!response.ok) throw new Error(`Erro do servidor: ${response.status}`);
+    const blob = await response.blob();
     const link = document.createElement('a');
     const url = URL.createObjectURL(blob);
-    const mesFormatado = formatarMesAno(mesFiltro).replace('/', '-');
     link.setAttribute('href', url);
-    link.setAttribute('download', `lancamentos_${mesFormatado}.csv`);
+    link.setAttribute('download', tarefa.nomeArquivo || 'resultado');
     link.style.visibility = 'hidden';
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
-
-    notificar(`CSV exportado! ${lancamentosMes.length} lançamento(s) de ${formatarMesAno(mesFiltro)}.`, 'success');
+    URL.revokeObjectURL(url);
 }
 
 // ==================== UTILITÁRIOS ====================
@@ -0,0 +1,259 @@
+"""
+Teste de carga local: vários operadores salvando lançamentos ao mesmo tempo,
+opcionalmente com leitores pesados (/api/dados e /api/backup) em paralelo.
+
+    # 1. suba o servidor como em produção (em outro terminal). SECRET_KEY precisa
+    #    ser fixa: sem ela cada worker gera a sua e a sessão de login não vale nos outros.
+    SECRET_KEY=teste gunicorn -c gunicorn.conf.py app:app
+
+    # 2. dispare os escritores (e leitores) concorrentes
+    python teste_carga.py --url http://127.0.0.1:8000 --escritores 8 --requisicoes 50
+    python teste_carga.py --escritores 4 --leitores 8
+
+    # Comparar perfis de serviço: sobe o gunicorn com cada PERFIL_SERVIDOR
+    # (gunicorn.conf.py) num banco SQLite temporário e imprime p50/p99 lado a lado
+    python teste_carga.py --comparar sync,threads,gevent
+
+Cada escritor faz POST /api/lancamentos em sequência (cria e depois edita o
+mesmo lançamento); cada leitor faz GET /api/dados, com um /api/backup a cada
+dez leituras. Conta como erro qualquer resposta fora de 200/201. Ao final mostra
+vazão, p50/p99 e quantos erros houve — o esperado é zero, sem nenhum
+"database is locked" no log do servidor.
+
+Usa só a biblioteca padrão. Os dados criados ficam num colaborador marcado com
+MARCADOR, removido ao final (a exclusão apaga os lançamentos em cascata).
+Login com ADMIN_USERNAME / ADMIN_PASSWORD do ambiente (padrão admin/admin123).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+MARCADOR = '[TESTE DE CARGA] Registro temporário, pode ser excluído.'
+
+
+class Cliente:
+    """Sessão HTTP autenticada (cookie de login), segura para uso entre threads."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self._cookies = CookieJar()
+        self._abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self._cookies))
+
+    def login(self, usuario, senha):
+        corpo = urllib.parse.urlencode({'username': usuario, 'password': senha}).encode()
+        try:
+            self._abridor.open(self.url + '/login', corpo, timeout=30)
+        except urllib.error.HTTPError as e:
+            raise SystemExit(f'Falha no login ({e.code}). Confira ADMIN_USERNAME/ADMIN_PASSWORD.')
+
+    def chamar(self, metodo, caminho, dados=None):
+        """Faz a requisição e devolve (status, corpo_json_ou_None, segundos)."""
+        corpo = json.dumps(dados).encode() if dados is not None else None
+        req = urllib.request.Request(self.url + caminho, data=corpo, method=metodo,
+                                     headers={'Content-Type': 'application/json'})
+        inicio = time.perf_counter()
+        try:
+            with self._abridor.open(req, timeout=60) as resp:
+                status, conteudo = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, conteudo = e.code, e.read()
+        decorrido = time.perf_counter() - inicio
+        try:
+            return status, json.loads(conteudo or b'null'), decorrido
+        except ValueError:
+            return status, None, decorrido
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def escritor(cliente, colaborador_id, n, requisicoes, resultado):
+    for i in range(requisicoes):
+        mes = f'{1900 + n:04d}-{i % 12 + 1:02d}'
+        lancamento = {
+            'colaboradorId': colaborador_id, 'mes': mes, 'ferias': 'Normal',
+            'remuneracao': 1000.0 + i, 'bonificacao': 0, 'totalRecebido': 1000.0 + i,
+            'liquidoTotal': 1000.0 + i, 'faltas': [], 'atestados': [], 'emprestimosPagos': [],
+        }
+        status, resposta, segundos = cliente.chamar('POST', '/api/lancamentos', lancamento)
+        # Metade das escritas são edições do lançamento recém-criado
+        if status == 201 and i % 2 == 1 and resposta:
+            resposta['outros'] = 1.0
+            status, resposta, extra = cliente.chamar('POST', '/api/lancamentos', resposta)
+            segundos += extra
+        resultado.registrar('escrita', status, segundos)
+
+
+def leitor(cliente, requisicoes, resultado):
+    for i in range(requisicoes):
+        caminho = '/api/backup' if i % 10 == 9 else '/api/dados'
+        status, _, segundos = cliente.chamar('GET', caminho)
+        resultado.registrar('leitura', status, segundos)
+
+
+class Resultado:
+    """Latências por tipo de operação e status de erro, compartilhados entre threads."""
+
+    def __init__(self):
+        self.latencias = {'escrita': [], 'leitura': []}
+        self.erros = []
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, tipo, status, segundos):
+        with self._lock:
+            self.latencias[tipo].append(segundos)
+            if status not in (200, 201):
+                self.erros.append(status)
+
+    def resumo(self, tipo):
+        valores = self.latencias[tipo]
+        return {
+            'qtd': len(valores),
+            'vazao': len(valores) / self.total if self.total else 0.0,
+            'p50': percentil(valores, 50) * 1000,
+            'p99': percentil(valores, 99) * 1000,
+            'media': statistics.mean(valores) * 1000 if valores else 0.0,
+        }
+
+
+def executar_carga(cliente, escritores, leitores, requisicoes):
+    """Cria o colaborador de teste, roda escritores/leitores em paralelo e limpa no fim."""
+    cpf = f'999.{int(time.time()) % 1000:03d}.{os.getpid() % 1000:03d}-99'
+    status, colaborador, _ = cliente.chamar('POST', '/api/colaboradores', {
+        'nome': 'Teste de Carga', 'cpf': cpf, 'contratacao': 'CLT',
+        'remuneracao': 1000, 'observacoes': MARCADOR, 'emprestimos': []})
+    if status != 201:
+        raise SystemExit(f'Não foi possível criar o colaborador de teste ({status}): {colaborador}')
+
+    resultado = Resultado()
+    threads = [threading.Thread(target=escritor,
+                                args=(cliente, colaborador['id'], n, requisicoes, resultado))
+               for n in range(escritores)]
+    threads += [threading.Thread(target=leitor, args=(cliente, requisicoes, resultado))
+                for _ in range(leitores)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    resultado.total = time.perf_counter() - inicio
+
+    cliente.chamar('DELETE', f"/api/colaboradores/{colaborador['id']}")
+    return resultado
+
+
+def imprimir(resultado, escritores, leitores, requisicoes):
+    print(f'Escritores: {escritores} / leitores: {leitores} x {requisicoes} requisições')
+    print(f'Tempo total: {resultado.total:.2f}s')
+    for tipo in ('escrita', 'leitura'):
+        r = resultado.resumo(tipo)
+        if r['qtd']:
+            print(f'{tipo.capitalize()}: {r["vazao"]:.1f}/s — p50: {r["p50"]:.1f} ms — '
+                  f'p99: {r["p99"]:.1f} ms — média: {r["media"]:.1f} ms')
+    erros = resultado.erros
+    print(f'Erros: {len(erros)}' + (f' (status: {sorted(set(erros))})' if erros else ''))
+
+
+def aguardar_servidor(url, segundos=30):
+    limite = time.time() + segundos
+    while time.time() < limite:
+        try:
+            with urllib.request.urlopen(url + '/healthz', timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            # URLError, conexão recusada ou timeout de socket enquanto os workers sobem
+            pass
+        time.sleep(0.3)
+    raise SystemExit(f'Servidor não respondeu em {url}/healthz')
+
+
+def comparar_perfis(perfis, args):
+    """Sobe o gunicorn com cada perfil, roda a mesma carga e imprime a tabela comparativa."""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    pasta = tempfile.mkdtemp(prefix='carga_')
+    linhas = []
+    for i, perfil in enumerate(perfis):
+        porta = args.porta + i
+        ambiente = dict(os.environ, PERFIL_SERVIDOR=perfil, SECRET_KEY='teste-de-carga',
+                        PORT=str(porta), WEB_CONCURRENCY=str(args.workers))
+        if not args.banco_atual:
+            ambiente['DATABASE_URL'] = 'sqlite:///' + os.path.join(pasta, f'{perfil}.db')
+        log = open(os.path.join(pasta, f'{perfil}.log'), 'w')
+        servidor = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+            cwd=raiz, env=ambiente, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            url = f'http://127.0.0.1:{porta}'
+            aguardar_servidor(url)
+            cliente = Cliente(url)
+            cliente.login(os.environ.get('ADMIN_USERNAME', 'admin'),
+                          os.environ.get('ADMIN_PASSWORD', 'admin123'))
+            resultado = executar_carga(cliente, args.escritores, args.leitores, args.requisicoes)
+            linhas.append((perfil, resultado))
+        finally:
+            servidor.terminate()
+            servidor.wait(timeout=30)
+            log.close()
+        # Avisos do gunicorn.conf.py (ex.: gevent ausente, caiu para "threads")
+        with open(os.path.join(pasta, f'{perfil}.log')) as f:
+            for linha in f:
+                if linha.startswith('[gunicorn.conf]'):
+                    print(f'{perfil}: {linha.strip()}')
+
+    print(f'Escritores: {args.escritores} / leitores: {args.leitores} x '
+          f'{args.requisicoes} requisições — {args.workers} worker(s) por perfil')
+    print(f'Logs do servidor em {pasta}')
+    print(f'{"perfil":<10}{"escrita p50":>13}{"p99":>10}{"leitura p50":>14}{"p99":>10}{"erros":>8}')
+    for perfil, resultado in linhas:
+        e, l = resultado.resumo('escrita'), resultado.resumo('leitura')
+        print(f'{perfil:<10}{e["p50"]:>10.1f} ms{e["p99"]:>7.1f} ms'
+              f'{l["p50"]:>11.1f} ms{l["p99"]:>7.1f} ms{len(resultado.erros):>8}')
+    return any(resultado.erros for _, resultado in linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--escritores', type=int, default=8)
+    parser.add_argument('--leitores', type=int, default=0)
+    parser.add_argument('--requisicoes', type=int, default=50, help='por escritor/leitor')
+    parser.add_argument('--comparar', help='perfis separados por vírgula (ex.: sync,threads,gevent)')
+    parser.add_argument('--workers', type=int, default=2, help='workers por perfil em --comparar')
+    parser.add_argument('--porta', type=int, default=8100, help='primeira porta usada em --comparar')
+    parser.add_argument('--banco-atual', action='store_true',
+                        help='em --comparar, usa a DATABASE_URL do ambiente em vez de SQLite temporário')
+    args = parser.parse_args()
+
+    if args.comparar:
+        houve_erro = comparar_perfis([p.strip() for p in args.comparar.split(',') if p.strip()], args)
+        raise SystemExit(1 if houve_erro else 0)
+
+    cliente = Cliente(args.url)
+    cliente.login(os.environ.get('ADMIN_USERNAME', 'admin'),
+                  os.environ.get('ADMIN_PASSWORD', 'admin123'))
+    resultado = executar_carga(cliente, args.escritores, args.leitores, args.requisicoes)
+    imprimir(resultado, args.escritores, args.leitores, args.requisicoes)
+    raise SystemExit(1 if resultado.erros else 0)
+
+
+if __name__ == '__main__':
+    main()